@@ -1,103 +1,203 @@
 from manim import *
 import json
+from functools import lru_cache
 import numpy as np
 
-def intensity_to_color(intensity):
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时使用标准库 json
+    orjson = None
+
+# === 恒星颜色查找表（模块加载时构建一次）===
+# 将 intensity (0-255) 映射为恒星颜色，分段断点只在此处定义：
+# - 暗星（低亮度） → 红/橙（低温）
+# - 中等亮度 → 黄/白
+# - 亮星（高亮度） → 白/蓝（高温）
+_COLOR_STOPS = 255.0 * np.array([0.0, 0.3, 0.6, 0.85, 1.0])
+_COLOR_STOP_RGB = np.array([color_to_rgb(c) for c in (RED, ORANGE, YELLOW, WHITE, BLUE)])
+_COLOR_LUT = np.empty((256, 3))
+for _channel in range(3):
+    _COLOR_LUT[:, _channel] = np.interp(np.arange(256), _COLOR_STOPS, _COLOR_STOP_RGB[:, _channel])
+
+def intensity_to_color_lut(intensities):
+    """
+    按 intensity 一次索引查表，返回 ManimColor 列表。
+    intensities 需为 uint8 数组。
+    """
+    return [ManimColor(rgb) for rgb in _COLOR_LUT[intensities]]
+
+def scale_and_distances(xs, ys, scale_x, scale_y):
+    """
+    坐标缩放与到中心的距离，均为整个数组上的向量化运算。
+    """
+    xs_scaled = xs * scale_x
+    ys_scaled = ys * scale_y
+    return xs_scaled, ys_scaled, np.hypot(xs_scaled, ys_scaled)
+
+@lru_cache(maxsize=None)
+def unit_circle_points():
+    """
+    单位圆的贝塞尔控制点，只生成一次，之后只做缩放 + 平移。
+    首次使用时才生成，以便与运行时选定的渲染器（Cairo 三次 / OpenGL 二次贝塞尔）一致。
+    """
+    return Circle(radius=1.0).points.astype(np.float32)
+
+def dots_points(centers, radii):
+    """
+    把多颗圆点的贝塞尔控制点拼接成一个 (N * len(unit_circle_points()), 3) 数组，
+    每颗星是一个独立的闭合子路径，可整体赋给一个 VMobject。
+    """
+    return (
+        unit_circle_points()[None, :, :] * radii[:, None, None] + centers[:, None, :]
+    ).reshape(-1, 3)
+
+def fade_in_updater(bucket_stars, centers, radii, delays, tracker, duration):
+    """
+    星星出现用的 updater，挂在一层分桶 VGroup 上：每帧只按 tracker 的当前时间
+    计算一次全部星星的进度，再逐桶重建已出现星星的几何体，
+    半径随进度从 0 增长到目标值；已全部出现的桶不再重建。
+    同一桶合并为一条路径，只有一个透明度，因此是“放大出现”而非逐星渐变透明度。
+    """
+    finished = [False] * len(bucket_stars)
+
+    def update(group):
+        # float() 使其按 Python 标量参与运算，结果保持 float32
+        progress = np.clip((float(tracker.get_value()) - delays) / duration, 0, 1)
+        for k, (bucket, stars) in enumerate(zip(group, bucket_stars)):
+            if finished[k]:
+                continue
+            p = progress[stars]
+            shown = p > 0
+            bucket.set_points(dots_points(centers[stars[shown]], radii[stars[shown]] * p[shown]))
+            finished[k] = bool(p.min() >= 1)
+    return update
+
+def flash_updater(tracker, starts, length):
     """
-    将 intensity (0-255) 映射为恒星颜色：
-    - 暗星（低亮度） → 红/橙（低温）
-    - 中等亮度 → 黄/白
-    - 亮星（高亮度） → 白/蓝（高温）
+    闪烁用的 updater：每颗星在 [start, start + length] 内按 sin² 闪两次，
+    所有叠加圆点共用一个 tracker，只需一次 play。
     """
-    t = min(1.0, max(0.0, intensity / 255.0))
-    if t < 0.3:
-        return interpolate_color(RED, ORANGE, t / 0.3)
-    elif t < 0.6:
-        return interpolate_color(ORANGE, YELLOW, (t - 0.3) / 0.3)
-    elif t < 0.85:
-        return interpolate_color(YELLOW, WHITE, (t - 0.6) / 0.25)
-    else:
-        return interpolate_color(WHITE, BLUE, (t - 0.85) / 0.15)
+    def update(group):
+        progress = np.clip((tracker.get_value() - starts) / length, 0, 1)
+        for dot, opacity in zip(group, np.sin(2 * PI * progress) ** 2):
+            dot.set_fill(opacity=opacity)
+    return update
 
 class StarFieldAnimation(Scene):
     def construct(self):
         # === 加载星星数据 ===
         json_path = 'star_positions.json'
+        rng = np.random.default_rng()
         try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-            stars = data['stars']
-            print(f"原始星星数量: {len(stars)}")
-
-            if len(stars) > 5000:
-                stars = list(np.random.choice(len(stars), 5000, replace=False))
-                stars = [data['stars'][i] for i in stars]
-            
-            print(f"随机选择了 {len(stars)} 颗星星用于渲染")
+            with open(json_path, 'rb') as f:
+                data = orjson.loads(f.read()) if orjson else json.load(f)
+            all_stars = data['stars']
+            print(f"原始星星数量: {len(all_stars)}")
+
+            # 直接抽样索引并填充数组，不再重建字典列表
+            if len(all_stars) > 5000:
+                idx = rng.choice(len(all_stars), size=5000, replace=False)
+            else:
+                idx = range(len(all_stars))
+            arr = np.array(
+                [(all_stars[i]['x'], all_stars[i]['y'], all_stars[i]['intensity']) for i in idx],
+                dtype=np.float32
+            ).reshape(-1, 3)
+
+            print(f"随机选择了 {len(arr)} 颗星星用于渲染")
         except FileNotFoundError:
             print("未找到 star_positions.json，使用随机星星")
-            stars = []
-            for _ in range(200):
-                angle = np.random.uniform(0, 2 * PI)
-                r = np.random.uniform(0.5, 4.0)
-                intensity = np.random.randint(150, 255)
-                stars.append({
-                    'x': r * np.cos(angle),
-                    'y': r * np.sin(angle),
-                    'intensity': intensity
-                })
+            angle = rng.uniform(0, 2 * PI, 200)
+            r = rng.uniform(0.5, 4.0, 200)
+            intensity = rng.integers(150, 255, 200)
+            arr = np.column_stack(
+                (r * np.cos(angle), r * np.sin(angle), intensity)
+            ).astype(np.float32)
+
+        # === 拆分为 SoA 数组，之后不再访问字典 ===
+        xs, ys, inten = arr.T
+        num_stars = len(arr)
 
         self.camera.background_color = BLACK
 
-        # === 坐标归一化 ===
-        if stars:
-            xs = [s['x'] for s in stars]
-            ys = [s['y'] for s in stars]
-            max_x = max(abs(x) for x in xs) or 1
-            max_y = max(abs(y) for y in ys) or 1
+        # === 统计量与坐标归一化（每项只做一次归约，统计面板直接复用）===
+        if num_stars:
+            x_min, x_max = float(xs.min()), float(xs.max())
+            y_min, y_max = float(ys.min()), float(ys.max())
+            intensity_max = float(inten.max())
+            intensity_mean = float(inten.mean())
+            max_x = max(-x_min, x_max) or 1
+            max_y = max(-y_min, y_max) or 1
             scale_x = 4.0 / max_x
             scale_y = 2.0 / max_y
         else:
             scale_x = scale_y = 1
+        # 缩放系数同为 float32，避免结果被提升为 float64
+        xs_scaled, ys_scaled, distances = scale_and_distances(
+            xs, ys, np.float32(scale_x), np.float32(scale_y)
+        )
+
+        # === 星星属性数组（全部保持 float32，只有赋给 mobject 时才由 Manim 提升精度）===
+        intensity_norm = inten / 255.0
+        radii = 0.01 + intensity_norm * 0.02
+        brightness = 0.4 + intensity_norm * 0.6    # 基础亮度足够
+        centers = np.column_stack((xs_scaled, ys_scaled, np.zeros(num_stars, dtype=np.float32)))
+
+        # 按距离排序（从中心向外），排名决定每颗星的渐入起始时间
+        sorted_indices = np.argsort(distances)
+        fade_run_time = 4.8      # 与原先 6 组 × 0.8s 相同
+        fade_duration = 0.44     # 每颗星的渐入时长
+        ranks = np.empty(num_stars, dtype=np.float32)
+        ranks[sorted_indices] = np.arange(num_stars)
+        delays = ranks / max(num_stars, 1) * (fade_run_time - fade_duration)
+        fade_tracker = ValueTracker(0)
+
+        # === 按颜色分桶合并几何体（不立即添加到场景）===
+        # 亮度量化为 16 档，每档一个 VMobject，绘制次数从 5000 降到 16
+        buckets = inten.astype(np.uint8) // 16
+        bucket_ids, bucket_counts = np.unique(buckets, return_counts=True)
+        bucket_colors = intensity_to_color_lut(bucket_ids * 16 + 8)
+        bucket_opacities = np.bincount(buckets, weights=brightness)[bucket_ids] / bucket_counts
+        bucket_members = np.split(np.argsort(buckets, kind='stable'), np.cumsum(bucket_counts)[:-1])
+        is_glowing = brightness > 0.8   # 辉光（仅亮星）
 
-        # === 创建星星对象（不立即添加到场景）===
-        star_objects = VGroup()
-        target_opacities = []  # 存储每个星星的目标透明度
-
-        for star in stars:
-            x = star['x'] * scale_x
-            y = star['y'] * scale_y
-            intensity_val = star['intensity']
-            intensity_norm = intensity_val / 255.0
-            radius = 0.01 + intensity_norm * 0.02     
-            brightness = 0.4 + intensity_norm * 0.6    # 基础亮度足够
-
-            target_opacities.append(brightness)
-            star_color = intensity_to_color(intensity_val)  # ← 动态颜色！
-
-            # 主星：实心圆
-            main_star = Circle(
-                radius=radius,
-                fill_color=star_color,
-                fill_opacity=1.0,
+        # 主星与辉光各自成一层扁平 VGroup，不再按星嵌套
+        main_group = VGroup()
+        glow_group = VGroup()
+        main_stars = []   # 与 main_group 对齐：每个桶的星星索引
+        glow_stars = []   # 与 glow_group 对齐：每个桶中亮星的索引
+        for members, bucket_color, opacity in zip(bucket_members, bucket_colors, bucket_opacities):
+            main_stars.append(members)
+            main_group.add(VMobject(fill_color=bucket_color, fill_opacity=opacity, stroke_width=0))
+
+            # 辉光：同色同透明度、2.5 倍半径的圆点
+            glowing = members[is_glowing[members]]
+            if len(glowing):
+                glow_stars.append(glowing)
+                glow_group.add(VMobject(fill_color=bucket_color, fill_opacity=opacity, stroke_width=0))
+
+        main_group.add_updater(fade_in_updater(
+            main_stars, centers, radii, delays, fade_tracker, fade_duration
+        ))
+        glow_group.add_updater(fade_in_updater(
+            glow_stars, centers, radii * 2.5, delays, fade_tracker, fade_duration
+        ))
+
+        # 闪烁用的叠加层：每颗闪烁星一个辉光大小的圆点，初始透明
+        bright_indices = np.flatnonzero(inten > 200)[:12]
+        flash_colors = intensity_to_color_lut(inten[bright_indices].astype(np.uint8))
+        flash_dots = VGroup()
+        for i, flash_color in zip(bright_indices, flash_colors):
+            dot = VMobject(
+                fill_color=flash_color,
+                fill_opacity=0,
                 stroke_width=0
-            ).move_to([x, y, 0])
-            main_star.set_opacity(0)  # 初始隐藏
-
-            # 辉光（仅亮星）
-            if brightness > 0.8:
-                glow = Circle(
-                    radius=radius * 2.5,
-                    fill_color=star_color,
-                    fill_opacity=1.0,
-                    stroke_width=0
-                ).move_to([x, y, 0])
-                glow.set_opacity(0)
-                star_obj = VGroup(main_star, glow)
-            else:
-                star_obj = main_star
+            )
+            dot.set_points(dots_points(centers[[i]], radii[[i]] * 2.5))
+            flash_dots.add(dot)
 
-            star_objects.add(star_obj)
+        # 仅作为旋转、淡出时的整体容器
+        star_objects = VGroup(glow_group, main_group, flash_dots)
 
         # ========================================
         # ✅ 动画序列（严格按顺序）
@@ -106,6 +206,8 @@ class StarFieldAnimation(Scene):
         # 1. 标题入场
         main_title = Text("ESO1242a", font_size=64, color=YELLOW)
         main_title.to_edge(UP)
+        # 结尾标题文字相同，直接复用字形几何，避免再次调用 Pango 排版
+        final_title = main_title.copy().scale(48 / 64)
         subtitle = Text("Star Field Visualization", font_size=36, color=BLUE_C)
         subtitle.next_to(main_title, DOWN, buff=0.3)
 
@@ -119,24 +221,10 @@ class StarFieldAnimation(Scene):
         # 3. ✅ 此时才将星星加入场景并渐入（关键！）
         self.add(star_objects)  # 在标题之后添加！
 
-        # 按距离排序（从中心向外）
-        distances = [
-            np.hypot(star['x'] * scale_x, star['y'] * scale_y)
-            for star in stars
-        ]
-        sorted_indices = np.argsort(distances)
-
-        # 分组渐入
-        num_groups = 6
-        group_size = len(stars) // num_groups
-        for i in range(num_groups):
-            start = i * group_size
-            end = (i + 1) * group_size if i < num_groups - 1 else len(stars)
-            anims = [
-                star_objects[idx].animate.set_opacity(target_opacities[idx])
-                for idx in sorted_indices[start:end]
-            ]
-            self.play(AnimationGroup(*anims, lag_ratio=0.01), run_time=0.8)
+        # 所有星星由同一个 ValueTracker 驱动出现（半径从 0 放大，透明度为所在桶的固定值），只需一次 play
+        self.play(fade_tracker.animate.set_value(fade_run_time), run_time=fade_run_time, rate_func=linear)
+        star_objects.update()  # 按最终进度刷新一次，再固定几何体供后续旋转
+        star_objects.clear_updaters()
         self.wait(0.5)
 
         # 4. 旋转星空
@@ -144,38 +232,35 @@ class StarFieldAnimation(Scene):
         self.wait(0.5)
 
         # 5. 星座连线
-        if stars:
-            bright_stars = sorted(stars, key=lambda s: s['intensity'], reverse=True)[:8]
-            lines = VGroup()
-            for i in range(len(bright_stars) - 1):
-                p1 = [bright_stars[i]['x'] * scale_x, bright_stars[i]['y'] * scale_y, 0]
-                p2 = [bright_stars[i+1]['x'] * scale_x, bright_stars[i+1]['y'] * scale_y, 0]
-                line = Line(p1, p2, color=BLUE_C, stroke_width=1.8, stroke_opacity=0.7)
-                line.set_opacity(0)
-                lines.add(line)
-                self.add(line)
-
-            if lines:
-                self.play(
-                    LaggedStart(*[line.animate.set_opacity(0.7) for line in lines], lag_ratio=0.2),
-                    run_time=2
-                )
+        if num_stars:
+            # O(N) 选出最亮的 8 颗，再只对这 8 颗排序
+            top_k = min(8, num_stars)
+            bright_stars = np.argpartition(-inten, top_k - 1)[:top_k]
+            bright_stars = bright_stars[np.argsort(-inten[bright_stars])]
+            # 一条折线（单个 VMobject）连起 8 颗亮星，而不是 7 个 Line
+            if top_k > 1:
+                constellation = VMobject()
+                constellation.set_points_as_corners(centers[bright_stars])
+                constellation.set_stroke(BLUE_C, width=1.8, opacity=0)
+                self.add(constellation)
+
+                self.play(constellation.animate.set_stroke(opacity=0.7), run_time=2)
                 self.wait(1.5)
-                self.play(FadeOut(lines, run_time=1))
+                self.play(FadeOut(constellation, run_time=1))
 
         # 6. 数据统计面板
-        if stars:
+        if num_stars:
             panel = Rectangle(width=5, height=4, color=BLUE_E, fill_color=BLACK, fill_opacity=0.85, stroke_width=2)
             panel.to_corner(DL, buff=0.5)
             panel_title = Text("统计数据", font_size=28, color=YELLOW)
             panel_title.next_to(panel.get_top(), DOWN, buff=0.2)
 
             stats = VGroup(
-                Text(f"星星总数: {len(stars)}", font_size=22),
-                Text(f"最大亮度: {max(s['intensity'] for s in stars):.0f}", font_size=22),
-                Text(f"平均亮度: {np.mean([s['intensity'] for s in stars]):.0f}", font_size=22),
-                Text(f"X 范围: [{min(s['x'] for s in stars):.1f}, {max(s['x'] for s in stars):.1f}]", font_size=22),
-                Text(f"Y 范围: [{min(s['y'] for s in stars):.1f}, {max(s['y'] for s in stars):.1f}]", font_size=22)
+                Text(f"星星总数: {num_stars}", font_size=22),
+                Text(f"最大亮度: {intensity_max:.0f}", font_size=22),
+                Text(f"平均亮度: {intensity_mean:.0f}", font_size=22),
+                Text(f"X 范围: [{x_min:.1f}, {x_max:.1f}]", font_size=22),
+                Text(f"Y 范围: [{y_min:.1f}, {y_max:.1f}]", font_size=22)
             )
             stats.arrange(DOWN, aligned_edge=LEFT, buff=0.15).move_to(panel.get_center())
             stats.set_color(WHITE)
@@ -186,26 +271,20 @@ class StarFieldAnimation(Scene):
             self.play(FadeOut(panel, panel_title, stats), run_time=1)
 
         # 7. 闪烁效果
-        if stars:
-            bright_indices = [i for i, s in enumerate(stars) if s['intensity'] > 200][:12]
-            flash_anims = []
-            for i in bright_indices:
-                obj = star_objects[i]
-                orig = target_opacities[i]
-                flash = Succession(
-                    obj.animate.set_opacity(min(orig * 2.2, 1.0)),
-                    obj.animate.set_opacity(orig),
-                    obj.animate.set_opacity(min(orig * 2.2, 1.0)),
-                    obj.animate.set_opacity(orig),
-                    lag_ratio=0.25
-                )
-                flash_anims.append(flash)
-            if flash_anims:
-                self.play(AnimationGroup(*flash_anims, lag_ratio=0.08), run_time=3)
+        # 闪烁星亮度均 > 0.87，orig * 2.2 总会封顶到 1.0，
+        # 因此叠加层在 0（原亮度）与 1（满亮度）之间切换即可
+        # 依次错开 8% 的闪烁时长，与原先 AnimationGroup(lag_ratio=0.08) 节奏一致
+        if len(flash_dots):
+            flash_tracker = ValueTracker(0)
+            flash_length = 1 / (1 + 0.08 * (len(flash_dots) - 1))
+            flash_starts = np.arange(len(flash_dots)) * 0.08 * flash_length
+            flash_dots.add_updater(flash_updater(flash_tracker, flash_starts, flash_length))
+            self.play(flash_tracker.animate.set_value(1), run_time=3, rate_func=linear)
+            flash_dots.update()
+            flash_dots.clear_updaters()
         self.wait(1)
 
         # 8. 最终展示
-        final_title = Text("ESO1242a", font_size=48, color=YELLOW)
         final_subtitle = Text("Stellar Cluster", font_size=28, color=BLUE_C)
         final_subtitle.next_to(final_title, DOWN, buff=0.2)
         final_group = VGroup(final_title, final_subtitle).to_edge(UP)
@@ -239,6 +318,8 @@ if __name__ == "__main__":
     config.frame_rate = 30
     config.background_color = BLACK
     config.output_file = "ESO1242a_star_field.mp4"
+    # 星星几何由 updater 逐帧生成，缓存无法命中，与 README 的 --disable_caching 一致
+    config.disable_caching = True
 
     scene = StarFieldAnimation()
     scene.render()